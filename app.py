@@ -1,72 +1,462 @@
 import logging
 import os
-import re
+import queue
 
 import uvicorn
+import anyio
 import asyncio
+import hmac
+import itertools
 import datetime
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 from fastapi import FastAPI, HTTPException, Security, status
 from fastapi.security import APIKeyHeader
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+import google.auth
+from google.api_core.exceptions import Forbidden, NotFound, PreconditionFailed
+from google.auth.transport.requests import AuthorizedSession
+from google.auth.transport.requests import Request as AuthRequest
 from google.cloud import storage
 from google.cloud import discoveryengine_v1 as discoveryengine
-from google.api_core.client_options import ClientOptions
+from google.cloud.discoveryengine_v1.services.conversational_search_service.transports import (
+    ConversationalSearchServiceGrpcAsyncIOTransport,
+)
 from proto import Message
-from google.protobuf.json_format import MessageToJson, MessageToDict
+from google.protobuf.json_format import MessageToDict
 from model import Request
-from functools import lru_cache
+from cachetools import TTLCache
+from functools import lru_cache, partial
+from typing import Optional
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
 
-API_KEY = os.environ["API_KEY"]
+API_KEYS = frozenset(key.encode() for key in os.environ["API_KEY"].split(","))
 PROJECT_ID = os.environ["GOOGLE_CLOUD_PROJECT"]
 BUCKET_NAME = os.environ["GCS_BUCKET"]
 LOCATION = os.environ.get("LOCATION", "global")
-
-storage_client = storage.Client()
-logging_bucket = storage_client.bucket(BUCKET_NAME)
-
-client_options = (
-    ClientOptions(api_endpoint=f"{LOCATION}-discoveryengine.googleapis.com")
+THREAD_POOL_SIZE = int(os.environ.get("THREAD_POOL_SIZE", 200))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+TOKEN_RETRY_SECONDS = 30
+METADATA_CACHE_SIZE = 50000
+METADATA_CACHE_TTL = 3600
+METADATA_CONCURRENCY = 16
+LOG_PREFIX = "vertexai-answers-proxy/logs/"
+LOG_QUEUE_SIZE = 1024
+LOG_WORKERS = 4
+LOG_UPLOAD_ATTEMPTS = 3
+LOG_BATCH_BYTES = 1024 * 1024
+LOG_BATCH_SECONDS = 5
+LOG_DRAIN_SECONDS = 10
+WARMUP_TIMEOUT_SECONDS = 10
+GRPC_POOL_SIZE = 4
+
+ENGINE_TEMPLATE = (
+    f"projects/{PROJECT_ID}/locations/{LOCATION}"
+    "/collections/default_collection/engines/{engine_id}"
+)
+SERVING_CONFIG_TEMPLATE = ENGINE_TEMPLATE + "/servingConfigs/default_serving_config"
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+# Object metadata by GCS URI, plus the lookups currently in flight so that
+# concurrent requests for the same URI share a single GCS round trip.
+metadata_cache = TTLCache(maxsize=METADATA_CACHE_SIZE, ttl=METADATA_CACHE_TTL)
+metadata_fetches: dict[str, asyncio.Task] = {}
+metadata_semaphore = asyncio.Semaphore(METADATA_CONCURRENCY)
+log_counter = itertools.count()
+_MISSING = object()
+
+DISCOVERY_ENGINE_ENDPOINT = (
+    f"{LOCATION}-discoveryengine.googleapis.com"
     if LOCATION != "global"
-    else None
+    else "discoveryengine.googleapis.com"
 )
 
-conversational_client = discoveryengine.ConversationalSearchServiceClient(
-    client_options=client_options
-)
+# Keep the Discovery Engine channels alive while idle so that the first request
+# after a quiet period does not pay for a reconnect. A local subchannel pool
+# gives every pooled channel its own connection instead of a shared one.
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.use_local_subchannel_pool", 1),
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+def configure_logging() -> tuple[QueueHandler, QueueListener]:
+    """
+    Routes log records through a queue drained by a background thread.
 
-app = FastAPI(docs_url=None, redoc_url=None)
-api_key_header = APIKeyHeader(name="X-API-Key")
+    The calling thread still merges each record's message with its arguments
+    and formats any traceback, since `QueueHandler.prepare` does that before
+    enqueueing. Applying `LOG_FORMAT` and the write to stderr happen on the
+    listener's thread, so the event loop never blocks on the stream.
+
+    Returns:
+        The QueueHandler installed on the root logger and the started
+        QueueListener, both to be torn down by `unconfigure_logging`.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = QueueListener(queue.SimpleQueue(), handler)
+    root_logger = logging.getLogger()
+    queue_handler = QueueHandler(listener.queue)
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(LOG_LEVEL)
+    listener.start()
+    return queue_handler, listener
+
+
+def unconfigure_logging(queue_handler: QueueHandler, listener: QueueListener):
+    """
+    Undoes `configure_logging`.
 
+    The handler is removed from the root logger before the listener stops, so
+    records logged afterwards are not left in a queue nobody drains, and a
+    second lifespan does not install a duplicate handler.
 
-async def write_to_gcs(answer, session_name: str):
+    Args:
+        queue_handler: The handler returned by `configure_logging`.
+        listener: The listener returned by `configure_logging`.
     """
-    Asynchronously writes a payload to a GCS bucket.
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()
+
+
+def create_http_session(credentials) -> AuthorizedSession:
+    """
+    Creates the pooled, keep-alive HTTP session used for every GCS call.
+
+    Sharing one session means metadata lookups and log uploads reuse warm
+    TLS connections instead of opening new ones.
 
     Args:
-        :param payload:
-        :param session_name:
+        credentials: The credentials used to authorize requests.
+
+    Returns:
+        An AuthorizedSession with a pooled HTTPS adapter mounted. The adapter
+        does not retry, so retries are left to the storage library's `retry=`
+        policies, which also map failures to google.api_core exceptions.
     """
+    http_session = AuthorizedSession(credentials)
+    http_session.mount(
+        "https://",
+        HTTPAdapter(pool_connections=32, pool_maxsize=64),
+    )
+    return http_session
 
-    json_payload = MessageToJson(
-        Message.pb(answer),
-        ensure_ascii=False,
+
+def create_conversational_client(
+    credentials,
+) -> discoveryengine.ConversationalSearchServiceAsyncClient:
+    """
+    Creates the Discovery Engine client on a keepalive-tuned gRPC channel.
+
+    Args:
+        credentials: The credentials used to authorize requests.
+
+    Returns:
+        A ConversationalSearchServiceAsyncClient bound to the current event loop.
+    """
+    channel = ConversationalSearchServiceGrpcAsyncIOTransport.create_channel(
+        f"{DISCOVERY_ENGINE_ENDPOINT}:443",
+        credentials=credentials,
+        options=GRPC_CHANNEL_OPTIONS,
+    )
+    transport = ConversationalSearchServiceGrpcAsyncIOTransport(
+        host=DISCOVERY_ENGINE_ENDPOINT, channel=channel
     )
+    return discoveryengine.ConversationalSearchServiceAsyncClient(transport=transport)
+
+
+async def refresh_credentials(credentials):
+    """
+    Keeps the shared credentials valid by refreshing them ahead of expiry.
 
-    filename = f"vertexai-answers-proxy/logs/{session_name}/{datetime.datetime.now().isoformat()}.json"
+    Both the GCS and Discovery Engine clients use the same credentials, so
+    refreshing them here means request handlers never pay for a token
+    refresh themselves.
+
+    Args:
+        credentials: The credentials to keep refreshed.
+    """
+    auth_request = AuthRequest()
+    while True:
+        try:
+            await asyncio.to_thread(credentials.refresh, auth_request)
+        except Exception as e:
+            logger.error("Error refreshing credentials: %s", e)
+            await asyncio.sleep(TOKEN_RETRY_SECONDS)
+            continue
+
+        if credentials.expiry is None:
+            # Credentials without an expiry never need refreshing.
+            return
+
+        # google-auth stores expiry as a naive UTC datetime.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        delay = (credentials.expiry - TOKEN_REFRESH_MARGIN - now).total_seconds()
+        await asyncio.sleep(max(delay, TOKEN_RETRY_SECONDS))
+
+
+def warm_up_gcs(bucket: storage.Bucket):
+    """
+    Makes a single authorized GCS call against the logging bucket.
 
+    The call is not retried. A 403 still means DNS, TLS and the access token
+    are in place, since the service account only needs object permissions on
+    the bucket and not `storage.buckets.get`.
+
+    Args:
+        bucket: The bucket used to open the GCS connection.
+    """
     try:
-        blob = logging_bucket.blob(filename)
-        await asyncio.to_thread(blob.upload_from_string, str(json_payload))
-        logging.info(f"Payload written to gs://{BUCKET_NAME}/{filename}")
-    except Exception as e:
-        logging.error(f"Error writing to GCS: {e}")
+        bucket.exists(timeout=WARMUP_TIMEOUT_SECONDS, retry=None)
+    except Forbidden:
+        pass
+
+
+async def warm_up(app: FastAPI):
+    """
+    Opens the connections that the first request would otherwise pay for.
+
+    Connects the Discovery Engine gRPC channels and makes a cheap authorized
+    GCS call, which resolves DNS, completes the TLS handshakes and fetches an
+    access token. Failures are only logged, since warming up is best effort.
+
+    Args:
+        app: The application whose clients should be warmed up.
+    """
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(
+                client.transport.grpc_channel.channel_ready(), WARMUP_TIMEOUT_SECONDS
+            )
+            for client in app.state.conversational_clients
+        ),
+        asyncio.wait_for(
+            asyncio.to_thread(warm_up_gcs, app.state.logging_bucket),
+            WARMUP_TIMEOUT_SECONDS,
+        ),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Error warming up connections: %r", result)
 
 
-def create_session(user_pseudo_id: str, engine_id: str) -> str:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the Google Cloud clients, starts the application's background
+    tasks, and tears both down on shutdown.
+
+    Clients are created here rather than at import time so that importing the
+    module stays cheap, each uvicorn worker builds its own connections, and
+    the asyncio gRPC channels are bound to the event loop that serves requests.
+    """
+    queue_handler, log_listener = configure_logging()
+
+    # Size both the asyncio default executor (asyncio.to_thread) and anyio's
+    # limiter (FastAPI's threadpool) for I/O bound work rather than the
+    # defaults of min(32, cpus + 4) and 40 threads.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE)
+    )
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_POOL_SIZE
+
+    credentials, _ = await asyncio.to_thread(google.auth.default, scopes=SCOPES)
+    app.state.http_session = create_http_session(credentials)
+    app.state.storage_client = storage.Client(
+        project=PROJECT_ID, credentials=credentials, _http=app.state.http_session
+    )
+    app.state.logging_bucket = app.state.storage_client.bucket(BUCKET_NAME)
+    app.state.conversational_clients = [
+        create_conversational_client(credentials) for _ in range(GRPC_POOL_SIZE)
+    ]
+    app.state.conversational_client_pool = itertools.cycle(
+        app.state.conversational_clients
+    )
+    app.state.log_queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+    uploads = asyncio.Queue(maxsize=LOG_WORKERS)
+    batcher = asyncio.create_task(log_batcher(app.state.log_queue, uploads))
+    tasks = [asyncio.create_task(refresh_credentials(credentials))] + [
+        asyncio.create_task(log_writer(uploads)) for _ in range(LOG_WORKERS)
+    ]
+    await warm_up(app)
+    yield
+    # Flush the batches still buffered, giving their uploads a bounded time.
+    try:
+        async with asyncio.timeout(LOG_DRAIN_SECONDS):
+            await app.state.log_queue.put(None)
+            await batcher
+            await uploads.join()
+    except TimeoutError:
+        logger.warning("Timed out flushing answer logs on shutdown")
+    batcher.cancel()
+    for task in tasks:
+        task.cancel()
+    for client in app.state.conversational_clients:
+        await client.transport.close()
+    app.state.http_session.close()
+    unconfigure_logging(queue_handler, log_listener)
+
+
+app = FastAPI(
+    docs_url=None,
+    redoc_url=None,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+api_key_header = APIKeyHeader(name="X-API-Key")
+
+
+def get_conversational_client() -> (
+    discoveryengine.ConversationalSearchServiceAsyncClient
+):
+    """Returns the next Discovery Engine client from the pool, round-robin."""
+    return next(app.state.conversational_client_pool)
+
+
+async def write_to_gcs(payload: bytes, session_name: str):
+    """
+    Asynchronously writes a payload to a GCS bucket.
+
+    Failed uploads are retried up to `LOG_UPLOAD_ATTEMPTS` times in total,
+    with an exponential backoff between attempts.
+
+    Args:
+        payload: Newline-delimited JSON encoded answers to write.
+        session_name: The name of the session the answers belong to.
+    """
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime(
+        "%Y%m%dT%H%M%S.%f"
+    )
+    # The process id and counter keep names unique when several answers for
+    # the same session are logged within the same microsecond.
+    filename = (
+        f"{LOG_PREFIX}{session_name}/{timestamp}-{os.getpid()}-{next(log_counter)}.ndjson"
+    )
+
+    # Log objects are create-only, which makes retrying the upload safe. This
+    # loop is the only retry layer: the storage library's own retry, which
+    # if_generation_match would otherwise enable, is turned off so a failing
+    # bucket cannot hold a log writer for minutes.
+    blob = app.state.logging_bucket.blob(filename)
+    for attempt in range(LOG_UPLOAD_ATTEMPTS):
+        try:
+            await asyncio.to_thread(
+                blob.upload_from_string,
+                payload,
+                content_type="application/x-ndjson",
+                if_generation_match=0,
+                retry=None,
+            )
+            logger.debug("Payload written to gs://%s/%s", BUCKET_NAME, filename)
+            return
+        except PreconditionFailed:
+            # An earlier attempt created the object before its response was lost.
+            return
+        except Exception as e:
+            if attempt + 1 == LOG_UPLOAD_ATTEMPTS:
+                logger.error("Error writing to GCS: %s", e)
+                return
+            logger.warning("Error writing to GCS, retrying: %s", e)
+            await asyncio.sleep(2**attempt)
+
+
+async def log_batcher(answers: asyncio.Queue, uploads: asyncio.Queue):
+    """
+    Groups queued answers into one newline-delimited JSON batch per session.
+
+    A session's batch is handed to the upload workers once it reaches
+    `LOG_BATCH_BYTES` or `LOG_BATCH_SECONDS` after its first answer, so a busy
+    session costs one GCS object per batch instead of one per answer. A None
+    item flushes every pending batch and stops the batcher.
+
+    Args:
+        answers: The queue of (record, session_name) tuples to batch, where
+            each record is a JSON object holding an answer and its timestamp.
+        uploads: The queue of (batch, session_name) tuples to upload.
+    """
+    loop = asyncio.get_running_loop()
+    batches: dict[str, bytearray] = {}
+    # Every batch waits the same time, so insertion order is deadline order.
+    deadlines: dict[str, float] = {}
+    while True:
+        timeout = next(iter(deadlines.values())) - loop.time() if deadlines else None
+        try:
+            item = await asyncio.wait_for(answers.get(), timeout)
+        except TimeoutError:
+            pass
+        else:
+            answers.task_done()
+            if item is None:
+                for session_name, batch in batches.items():
+                    await uploads.put((bytes(batch), session_name))
+                return
+
+            record, session_name = item
+            batch = batches.setdefault(session_name, bytearray())
+            deadlines.setdefault(session_name, loop.time() + LOG_BATCH_SECONDS)
+            batch += record
+            batch += b"\n"
+            if len(batch) >= LOG_BATCH_BYTES:
+                del deadlines[session_name]
+                await uploads.put((bytes(batches.pop(session_name)), session_name))
+
+        now = loop.time()
+        while deadlines and next(iter(deadlines.values())) <= now:
+            session_name = next(iter(deadlines))
+            del deadlines[session_name]
+            await uploads.put((bytes(batches.pop(session_name)), session_name))
+
+
+async def log_writer(uploads: asyncio.Queue):
+    """
+    Drains batched answers and writes each batch to GCS.
+
+    A fixed number of these workers runs per process, which bounds how many
+    uploads are in flight regardless of how many answers are being served.
+
+    Args:
+        uploads: The queue of (batch, session_name) tuples to write.
+    """
+    while True:
+        batch, session_name = await uploads.get()
+        try:
+            await write_to_gcs(batch, session_name)
+        except Exception as e:
+            logger.error("Error logging answers for %s: %s", session_name, e)
+        finally:
+            uploads.task_done()
+
+
+@lru_cache(maxsize=64)
+def get_engine_name(engine_id: str) -> str:
+    """Returns the full resource name of a Discovery Engine engine."""
+    return ENGINE_TEMPLATE.format(engine_id=engine_id)
+
+
+@lru_cache(maxsize=64)
+def get_serving_config(engine_id: str) -> str:
+    """Returns the full resource name of an engine's default serving config."""
+    return SERVING_CONFIG_TEMPLATE.format(engine_id=engine_id)
+
+
+async def create_session(user_pseudo_id: str, engine_id: str) -> str:
     """Creates a new session in the specified data store.
 
-    This function sends a POST request to the Agent Builder API to create
-    a new session associated with the provided user pseudo ID and data store.
+    This function sends a request to the Agent Builder API to create a new
+    session associated with the provided user pseudo ID and data store.
 
     Args:
         user_pseudo_id: The unique identifier of the user.
@@ -78,9 +468,9 @@ def create_session(user_pseudo_id: str, engine_id: str) -> str:
     Raises:
         requests.exceptions.RequestException: If the request to the Discovery Engine API fails.
     """
-    session = conversational_client.create_session(
+    session = await get_conversational_client().create_session(
         # The full resource name of the engine
-        parent=f"projects/{PROJECT_ID}/locations/{LOCATION}/collections/default_collection/engines/{engine_id}",
+        parent=get_engine_name(engine_id),
         session=discoveryengine.Session(user_pseudo_id=user_pseudo_id),
     )
     return session.name
@@ -99,15 +489,18 @@ def parse_gcs_uri(uri: str) -> tuple[str, str]:
         ValueError: If the URI is not a valid Google Cloud Storage URI.
     """
 
-    match = re.match(r"^gs://(?P<bucket>[^/]+)/(?P<name>.*)$", uri)
-    if not match:
+    bucket, separator, name = uri.removeprefix("gs://").partition("/")
+    if not uri.startswith("gs://") or not bucket or not separator:
         raise ValueError("Invalid Google Cloud Storage URI: {}".format(uri))
-    return match.group("bucket"), match.group("name")
+    return bucket, name
 
 
-def get_api_key(api_key_header: str = Security(api_key_header)) -> str:
+async def get_api_key(api_key_header: str = Security(api_key_header)) -> str:
     """Validates an API key provided in a request header.
 
+    Declared async so FastAPI runs it on the event loop instead of handing
+    every request to the thread pool for a comparison that never blocks.
+
     Args:
         api_key_header: The API key value extracted from the request header
                         using the 'api_key_header' Security dependency.
@@ -119,7 +512,10 @@ def get_api_key(api_key_header: str = Security(api_key_header)) -> str:
         HTTPException: If the provided API key is invalid or missing, with a
                        status code of 401 (Unauthorized).
     """
-    if api_key_header in [API_KEY]:
+    # Compare bytes: compare_digest rejects str arguments with non-ASCII
+    # characters, which a client could otherwise use to trigger a 500.
+    api_key = api_key_header.encode()
+    if any(hmac.compare_digest(api_key, key) for key in API_KEYS):
         return api_key_header
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -138,8 +534,21 @@ async def healthcheck() -> str:
     return "OK"
 
 
-@lru_cache(maxsize=None)
-def get_metadata(uri: str) -> dict[str, str]:
+@lru_cache(maxsize=64)
+def get_bucket(bucket_name: str) -> storage.Bucket:
+    """
+    Returns a memoized handle for a Google Cloud Storage bucket.
+
+    Args:
+        bucket_name: The name of the bucket.
+
+    Returns:
+        A Bucket bound to the shared, pooled storage client.
+    """
+    return app.state.storage_client.bucket(bucket_name)
+
+
+def fetch_metadata(uri: str) -> dict[str, str]:
     """
     Extracts metadata from a Google Cloud Storage object.
 
@@ -147,29 +556,87 @@ def get_metadata(uri: str) -> dict[str, str]:
         uri: A Google Cloud Storage URI in the format "gs://bucket_name/object_name".
 
     Returns:
-        A list of Metadata objects representing the object's metadata.
+        A dictionary with the object's custom metadata, or None if the object
+        does not exist, has no custom metadata, or can never be read (an
+        invalid URI or a 403).
 
     Raises:
-        ValueError: If the provided URI is not a valid Google Cloud Storage URI.
-        GoogleCloudError: If there is an error communicating with the Google Cloud Storage service.
+        GoogleCloudError: If there is a transient error communicating with the Google Cloud Storage service.
     """
     try:
         bucket_name, blob_name = parse_gcs_uri(uri)
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.get_blob(blob_name)
-        return blob.metadata
-    except Exception as e:
-        logging.error(f"Error obtaining metadata for {uri}: {e}")
-    return None
+        blob = get_bucket(bucket_name).get_blob(blob_name)
+    except (ValueError, Forbidden, NotFound) as e:
+        # These fail the same way on every attempt, so they are returned as
+        # None and cached like a missing object.
+        logger.error("Error obtaining metadata for %s: %s", uri, e)
+        return None
+    if blob is None:
+        logger.warning("Referenced object %s does not exist", uri)
+        return None
+    return blob.metadata
+
+
+async def _fetch_metadata_bounded(uri: str) -> dict[str, str]:
+    """Runs `fetch_metadata` in a worker thread, bounded by `metadata_semaphore`."""
+    async with metadata_semaphore:
+        return await asyncio.to_thread(fetch_metadata, uri)
+
+
+def _finish_metadata_fetch(uri: str, fetch: asyncio.Task):
+    """Caches the result of a successful metadata fetch and forgets the task.
+
+    Failed fetches, which `fetch_metadata` only raises for transient GCS
+    errors, are not cached, so the next request retries them instead of
+    hiding the metadata for `METADATA_CACHE_TTL`.
+    """
+    del metadata_fetches[uri]
+    if not fetch.cancelled() and fetch.exception() is None:
+        metadata_cache[uri] = fetch.result()
+
+
+async def get_metadata(uri: str) -> dict[str, str]:
+    """
+    Returns the metadata of a Google Cloud Storage object, using a TTL cache.
+
+    On a cache miss the object is fetched in a worker thread, with at most
+    `METADATA_CONCURRENCY` fetches running at once. Concurrent callers asking
+    for the same URI await the same in-flight fetch instead of issuing their
+    own.
+
+    Args:
+        uri: A Google Cloud Storage URI in the format "gs://bucket_name/object_name".
 
+    Returns:
+        A dictionary with the object's custom metadata, or None if the object
+        does not exist or has no custom metadata.
+
+    Raises:
+        Any exception raised by `fetch_metadata`. These are not cached.
+    """
+    metadata = metadata_cache.get(uri, _MISSING)
+    if metadata is not _MISSING:
+        return metadata
+
+    fetch = metadata_fetches.get(uri)
+    if fetch is None:
+        fetch = asyncio.create_task(_fetch_metadata_bounded(uri))
+        metadata_fetches[uri] = fetch
+        fetch.add_done_callback(partial(_finish_metadata_fetch, uri))
+    # Shield the shared fetch so one cancelled caller does not cancel it for
+    # every other caller waiting on the same URI.
+    return await asyncio.shield(fetch)
 
-def enrich_answer_with_metadata(answer):
+
+async def enrich_answer_with_metadata(answer):
     """Enriches an answer message with object metadata from each referenced chunk's URI.
 
     This function takes a protobuf answer message, converts it to a dictionary,
     and then adds object metadata to each reference's chunk information.  The
     metadata is retrieved using the `get_metadata` function, based on the URI
-    specified in the document metadata of each chunk.
+    specified in the document metadata of each chunk. Each distinct URI is
+    looked up once, and the lookups run concurrently with each other and with
+    the dictionary conversion.
 
     Args:
         answer: A protobuf message representing the answer.
@@ -179,24 +646,130 @@ def enrich_answer_with_metadata(answer):
         the added object metadata within each reference's chunkInfo.
 
     Raises:
-        Any exceptions raised by `MessageToDict`, `Message.pb`, or `get_metadata` will be propagated.
+        Any exceptions raised by `MessageToDict` or `Message.pb` will be propagated.
+        Metadata lookup errors are logged and the reference's metadata is set to None.
     """
-    answer_dict = MessageToDict(
-        Message.pb(answer),
+    answer_pb = Message.pb(answer)
+    # Read the URIs straight from the proto so metadata lookups can start
+    # before the (CPU bound) dictionary conversion has finished. Unset fields
+    # read as "", which marks references without chunk information. Only
+    # "gs://" URIs have object metadata; website and BigQuery data stores
+    # return other URIs, whose references get None without a lookup.
+    uris = [
+        reference.chunk_info.document_metadata.uri
+        for reference in answer_pb.answer.references
+    ]
+    unique_uris = [uri for uri in dict.fromkeys(uris) if uri.startswith("gs://")]
+    if not any(uris):
+        logger.debug("Answer does not contain any references")
+        return await asyncio.to_thread(MessageToDict, answer_pb)
+
+    answer_dict, metadata = await asyncio.gather(
+        asyncio.to_thread(MessageToDict, answer_pb),
+        asyncio.gather(*map(get_metadata, unique_uris), return_exceptions=True),
     )
-    try:
-        for reference in answer_dict["answer"]["references"]:
-            uri = reference["chunkInfo"]["documentMetadata"]["uri"]
-            reference["chunkInfo"]["objectMetadata"] = get_metadata(uri)
-    except KeyError as e:
-        logging.info(f"Answer does not contain any references: {e}")
+    metadata = dict(zip(unique_uris, metadata))
+    for uri, result in metadata.items():
+        if isinstance(result, Exception):
+            logger.error("Error obtaining metadata for %s: %s", uri, result)
+            metadata[uri] = None
+    for reference, uri in zip(answer_dict["answer"]["references"], uris):
+        if uri:
+            reference["chunkInfo"]["objectMetadata"] = metadata.get(uri)
     return answer_dict
 
 
-@app.post("/answer/{engine_id}", response_model_exclude_none=True)
+@lru_cache(maxsize=128)
+def get_answer_query_template(
+    disable_query_rephraser: Optional[bool],
+    max_rephrase_steps: Optional[int],
+    ignore_adversarial_query: Optional[bool],
+    ignore_non_answer_seeking_query: Optional[bool],
+    ignore_low_relevant_content: Optional[bool],
+    model_version: Optional[str],
+    include_citations: Optional[bool],
+    language_code: Optional[str],
+    max_return_results: Optional[int],
+):
+    """Builds the query understanding, answer generation and search specs once.
+
+    Clients tend to send the same handful of option combinations, so the specs
+    for each combination are built a single time and cached as a protobuf
+    template that requests are copied from. Parameters that are None are left
+    unset, as proto-plus does. The preamble is free text that often differs
+    per request, so it is set by `build_answer_query_request` instead of being
+    part of the cache key.
+
+    Returns:
+        An AnswerQueryRequest protobuf message holding only the specs. It is
+        shared between requests and must not be modified.
+    """
+    pb = discoveryengine.AnswerQueryRequest.pb()()
+    rephraser_spec = pb.query_understanding_spec.query_rephraser_spec
+    generation_spec = pb.answer_generation_spec
+    search_params = pb.search_spec.search_params
+    for message, field, value in (
+        (rephraser_spec, "disable", disable_query_rephraser),
+        (rephraser_spec, "max_rephrase_steps", max_rephrase_steps),
+        (generation_spec, "ignore_adversarial_query", ignore_adversarial_query),
+        (
+            generation_spec,
+            "ignore_non_answer_seeking_query",
+            ignore_non_answer_seeking_query,
+        ),
+        (generation_spec, "ignore_low_relevant_content", ignore_low_relevant_content),
+        (generation_spec.model_spec, "model_version", model_version),
+        (generation_spec, "include_citations", include_citations),
+        (generation_spec, "answer_language_code", language_code),
+        (search_params, "max_return_results", max_return_results),
+    ):
+        if value is not None:
+            setattr(message, field, value)
+    return pb
+
+
+def build_answer_query_request(
+    request: Request, serving_config: str, session_name: str
+) -> discoveryengine.AnswerQueryRequest:
+    """Builds the Discovery Engine AnswerQueryRequest for an incoming request.
+
+    The specs are copied from a cached template with a single `CopyFrom`, and
+    only the per-request fields are assigned, directly on the underlying
+    protobuf message rather than through proto-plus.
+
+    Args:
+        request: The incoming request containing the user's query and other parameters.
+        serving_config: The full resource name of the serving config to query.
+        session_name: The full resource name of the session.
+
+    Returns:
+        The AnswerQueryRequest to send to the Discovery Engine API.
+    """
+    template = get_answer_query_template(
+        request.disable_query_rephraser,
+        request.max_rephrase_steps,
+        request.ignore_adversarial_query,
+        request.ignore_non_answer_seeking_query,
+        request.ignore_low_relevant_content,
+        request.model_version,
+        request.include_citations,
+        request.language_code,
+        request.max_return_results,
+    )
+    pb = discoveryengine.AnswerQueryRequest.pb()()
+    pb.CopyFrom(template)
+    pb.serving_config = serving_config
+    pb.query.text = request.query
+    pb.session = session_name
+    if request.preamble is not None:
+        pb.answer_generation_spec.prompt_spec.preamble = request.preamble
+    return discoveryengine.AnswerQueryRequest.wrap(pb)
+
+
+@app.post("/answer/{engine_id}")
 async def answer(
     engine_id: str, request: Request, api_key: str = Security(get_api_key)
-) -> JSONResponse:
+) -> Response:
     """
     Answers a user's query using Vertex AI Answers API.
 
@@ -215,59 +788,45 @@ async def answer(
         HTTPException: If an error occurs during the API call or response processing.
     """
     if request.session.name is None:
-        session_name = create_session(request.session.user_pseudo_id, engine_id)
+        session_name = await create_session(
+            request.session.user_pseudo_id, engine_id
+        )
     else:
         session_name = request.session.name
 
-    serving_config = f"projects/{PROJECT_ID}/locations/{LOCATION}/collections/default_collection/engines/{engine_id}/servingConfigs/default_serving_config"
+    serving_config = get_serving_config(engine_id)
 
-    query_understanding_spec = discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec(
-        query_rephraser_spec=discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryRephraserSpec(
-            disable=request.disable_query_rephraser,
-            max_rephrase_steps=request.max_rephrase_steps,
-        ),
-    )
+    request = build_answer_query_request(request, serving_config, session_name)
 
-    answer_generation_spec = discoveryengine.AnswerQueryRequest.AnswerGenerationSpec(
-        ignore_adversarial_query=request.ignore_adversarial_query,
-        ignore_non_answer_seeking_query=request.ignore_non_answer_seeking_query,
-        ignore_low_relevant_content=request.ignore_low_relevant_content,
-        model_spec=discoveryengine.AnswerQueryRequest.AnswerGenerationSpec.ModelSpec(
-            model_version=request.model_version,
-        ),
-        prompt_spec=discoveryengine.AnswerQueryRequest.AnswerGenerationSpec.PromptSpec(
-            preamble=request.preamble,
-        ),
-        include_citations=request.include_citations,
-        answer_language_code=request.language_code,
-    )
+    answer = await get_conversational_client().answer_query(request)
+    answer = await enrich_answer_with_metadata(answer)
 
-    search_spec = discoveryengine.AnswerQueryRequest.SearchSpec(
-        search_params=discoveryengine.AnswerQueryRequest.SearchSpec.SearchParams(
-            max_return_results=request.max_return_results,
-        )
-    )
-
-    request = discoveryengine.AnswerQueryRequest(
-        serving_config=serving_config,
-        query=discoveryengine.Query(text=request.query),
-        session=session_name,
-        query_understanding_spec=query_understanding_spec,
-        answer_generation_spec=answer_generation_spec,
-        search_spec=search_spec,
-    )
-
-    answer = conversational_client.answer_query(request)
-
-    asyncio.create_task(
-        write_to_gcs(answer, session_name)
-    )  # Non-blocking task creation
-
-    answer = enrich_answer_with_metadata(answer)
+    # The answer is converted and encoded once; the same bytes are both
+    # logged and returned. Each log record carries the time the answer was
+    # produced, since a batch's object name only records its upload time.
+    payload = orjson.dumps(answer)
+    timestamp = orjson.dumps(datetime.datetime.now(datetime.timezone.utc))
+    record = b'{"timestamp":' + timestamp + b',"answer":' + payload + b"}"
+    try:
+        app.state.log_queue.put_nowait((record, session_name))
+    except asyncio.QueueFull:
+        logger.warning("Log queue is full, dropping answer log for %s", session_name)
 
-    return JSONResponse(content=answer)
+    return Response(content=payload, media_type="application/json")
 
 
 if __name__ == "__main__":
-    port = os.environ.get("PORT", 8000)
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    port = int(os.environ.get("PORT", 8000))
+    workers = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        backlog=2048,
+        limit_concurrency=1024,
+        access_log=False,
+        log_level="warning",
+    )